@@ -3,11 +3,18 @@
 import asyncio
 import logging
 
+import aiohttp
 from aiogram import Bot, Dispatcher
 from aiogram.contrib.fsm_storage.memory import MemoryStorage
 
+try:
+    import uvloop
+except ImportError:  # uvloop isn't available on Windows
+    uvloop = None
+
 from src.handlers import register_message_handlers, register_callback_query_handlers, register_error_handlers
 from src.middlewares import register_middlewares
+from src.utils.requests import get_api_url
 from src.utils.utils import load_config
 
 logger = logging.getLogger(__name__)
@@ -27,6 +34,17 @@ async def main():
     dp = Dispatcher(bot, storage=storage)
 
     bot["config"] = config
+    bot["api_urls"] = {
+        action: get_api_url(config["model_app"]["model_url"], action)
+        for action in ("transfer", "examples")
+    }
+    bot["http_session"] = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=20,
+            ssl=None if config["bot_app"]["verify_ssl"] else False,
+            keepalive_timeout=60
+        )
+    )
 
     register_middlewares(dp)
     register_message_handlers(dp)
@@ -34,15 +52,19 @@ async def main():
     register_error_handlers(dp)
 
     try:
+        bot["me"] = await bot.get_me()
         await dp.skip_updates()
-        await dp.start_polling()
+        await dp.start_polling(timeout=config["bot_app"]["poll_timeout"], relax=0.1, fast=True)
     finally:
         await dp.storage.close()
         await dp.storage.wait_closed()
+        await bot["http_session"].close()
         await bot.session.close()
 
 
 if __name__ == "__main__":
+    if uvloop:
+        uvloop.install()
     try:
         asyncio.run(main())
     except (KeyboardInterrupt, SystemExit):
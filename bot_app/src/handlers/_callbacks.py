@@ -1,7 +1,7 @@
 """Module provides callback query handlers."""
 
 from aiogram import types
-from aiogram.dispatcher import Dispatcher
+from aiogram.dispatcher import Dispatcher, FSMContext
 
 from src.handlers._messages import start_style_transfer_cmd_handler
 from src.states import StartStyleTransferForm
@@ -26,15 +26,15 @@ async def postpone_style_transfer_callback_handler(callback: types.CallbackQuery
     await callback.message.answer(msg)
 
 
-async def receive_chosen_style_callback_handler(callback: types.CallbackQuery):
+async def receive_chosen_style_callback_handler(callback: types.CallbackQuery, state: FSMContext):
     """
     Receive a chosen style from the user.
     """
     if callback.data != "style_custom":
         await StartStyleTransferForm.send_content_images.set()
-        async with Dispatcher.get_current().current_state().proxy() as data:
+        async with state.proxy() as data:
             data["style"] = callback.data
-            data["style_image"] = None
+            data["style_image_id"] = None
 
         await callback.message.answer(
             f"Please send me up to {StartStyleTransferForm.max_images} images that you would like to transform.\n"
@@ -44,7 +44,7 @@ async def receive_chosen_style_callback_handler(callback: types.CallbackQuery):
 
     else:
         await StartStyleTransferForm.next()
-        async with Dispatcher.get_current().current_state().proxy() as data:
+        async with state.proxy() as data:
             data["style"] = callback.data
 
         await callback.message.answer(
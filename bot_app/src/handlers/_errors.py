@@ -6,6 +6,8 @@ from aiogram import types
 from aiogram.dispatcher import Dispatcher
 from aiohttp import ClientOSError
 
+_HANDLED_ELSEWHERE = (TimeoutError, ClientOSError)
+
 
 async def timeout_error_handler(update: types.Update, exception: TimeoutError) -> bool:
     """
@@ -41,8 +43,7 @@ async def other_errors_handler(update: types.Update, exception: Exception) -> bo
     :param update: update.
     :param exception: any exception.
     """
-    excluded_exceptions = [TimeoutError, ClientOSError]
-    if all(map(lambda x: not isinstance(exception, x), excluded_exceptions)):
+    if not isinstance(exception, _HANDLED_ELSEWHERE):
         await update.message.answer("Sorry! Something went wrong. Please try it later.")
     return True
 
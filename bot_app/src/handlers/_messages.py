@@ -1,13 +1,36 @@
 """Module provides message handlers."""
 
-from io import BytesIO
+import asyncio
 from typing import List
 
 from aiogram import Dispatcher, types
 from aiogram.dispatcher import FSMContext
 
 from src.states import StartStyleTransferForm
-from src.utils.requests import request_style_transfer, request_examples, get_api_url
+from src.utils.images import download_image
+from src.utils.requests import request_style_transfer, request_examples
+
+_REMINDERS = {
+    StartStyleTransferForm.choose_style.state: (
+        "Just a little reminder.\n"
+        "For now I expect you to choose a style from the list.\n"
+        "If you want to cancel the current operation, just send \"/cancel\" to the chat."
+    ),
+    StartStyleTransferForm.send_style_image.state: (
+        "Just a little reminder.\n"
+        "For now I expect you to send me a single style-image.\n"
+        "If you want to cancel the current operation, just send \"/cancel\" to the chat."
+    ),
+    StartStyleTransferForm.send_content_images.state: (
+        "Just a little reminder.\n"
+        f"For now I expect you to send me up to {StartStyleTransferForm.max_images} images to be transformed.\n"
+        "If you want to cancel the current operation, just send \"/cancel\" to the chat"
+    ),
+    StartStyleTransferForm.await_model_response.state: (
+        "I'm working on your request. Please wait a moment.\n"
+        "If you want to cancel the current operation, just send \"/cancel\" to the chat"
+    )
+}
 
 
 async def help_cmd_handler(message: types.Message):
@@ -29,7 +52,6 @@ async def start_cmd_handler(message: types.Message):
     """
     Set the "/start" command behavior.
     """
-    bot_info = await message.bot.get_me()
     msg = (
         "Hi, {user_name}!\n"
         "My name is \"{bot_name}\".\n"
@@ -43,7 +65,7 @@ async def start_cmd_handler(message: types.Message):
         types.InlineKeyboardButton(text="Maybe later...", callback_data="postpone_style_transfer")
     )
     await message.reply(
-        msg.format(user_name=message.from_user.first_name, bot_name=bot_info.first_name),
+        msg.format(user_name=message.from_user.first_name, bot_name=message.bot["me"].first_name),
         reply_markup=inline_keyboard
     )
 
@@ -72,9 +94,7 @@ async def receive_style_image_handler(message: types.Message, state: FSMContext)
     Receive a style-image from the user and ask them to send content-images.
     """
     async with state.proxy() as data:
-        style_image = BytesIO()
-        await message.photo[-1].download(destination_file=style_image)
-        data["style_image"] = style_image
+        data["style_image_id"] = message.photo[-1].file_id
     await StartStyleTransferForm.next()
     await message.answer(
         "Thanks!\n"
@@ -91,10 +111,13 @@ async def receive_content_image_handler(message: types.Message, state: FSMContex
     Then send style and content images to the model application.
     Then receive the result and send it back to the user.
     """
-    async with state.proxy() as data:
-        content_image = BytesIO()
-        await message.photo[-1].download(destination_file=content_image)
-        data["content_images"] = [content_image]
+    data = await state.get_data()
+    style, style_image_id = data["style"], data["style_image_id"]
+    style_image, content_image = await asyncio.gather(
+        download_image(message.bot, style_image_id),
+        download_image(message.bot, message.photo[-1].file_id)
+    )
+    content_images = [content_image]
 
     await StartStyleTransferForm.next()
     await message.answer(
@@ -102,18 +125,17 @@ async def receive_content_image_handler(message: types.Message, state: FSMContex
     )
 
     try:
-        async with Dispatcher.get_current().current_state().proxy() as data:
-            processed_images = await request_style_transfer(
-                get_api_url(message.bot["config"]["model_app"]["model_url"], "transfer"),
-                data["style"],
-                data["style_image"],
-                data["content_images"],
-                message.bot["config"]["model_app"]["username"],
-                message.bot["config"]["model_app"]["password"],
-                message.bot["config"]["bot_app"]["verify_ssl"]
-            )
-
-        curr_state = await Dispatcher.get_current().current_state().get_state()
+        processed_images = await request_style_transfer(
+            message.bot["http_session"],
+            message.bot["api_urls"]["transfer"],
+            style,
+            style_image,
+            content_images,
+            message.bot["config"]["model_app"]["username"],
+            message.bot["config"]["model_app"]["password"]
+        )
+
+        curr_state = await state.get_state()
         if curr_state == StartStyleTransferForm.await_model_response.state:
             await message.answer("Here you are!")
             await message.answer_photo(types.InputFile(processed_images[0]))
@@ -128,13 +150,13 @@ async def receive_content_images_handler(message: types.Message, media_group: Li
     Then send style and content images to the model application.
     Then receive the result and send it back to the user.
     """
-    async with state.proxy() as data:
-        data["content_images"] = []
-        for msg in media_group:
-            if msg.photo and len(data["content_images"]) < StartStyleTransferForm.max_images:
-                content_image = BytesIO()
-                await msg.photo[-1].download(destination_file=content_image)
-                data["content_images"].append(content_image)
+    photo_messages = [msg for msg in media_group if msg.photo][:StartStyleTransferForm.max_images]
+    data = await state.get_data()
+    style, style_image_id = data["style"], data["style_image_id"]
+    style_image, *content_images = await asyncio.gather(
+        download_image(message.bot, style_image_id),
+        *(download_image(message.bot, msg.photo[-1].file_id) for msg in photo_messages)
+    )
 
     await StartStyleTransferForm.next()
     await message.answer(
@@ -142,22 +164,21 @@ async def receive_content_images_handler(message: types.Message, media_group: Li
     )
 
     try:
-        async with Dispatcher.get_current().current_state().proxy() as data:
-            processed_images = await request_style_transfer(
-                get_api_url(message.bot["config"]["model_app"]["model_url"], "transfer"),
-                data["style"],
-                data["style_image"],
-                data["content_images"],
-                message.bot["config"]["model_app"]["username"],
-                message.bot["config"]["model_app"]["password"],
-                message.bot["config"]["bot_app"]["verify_ssl"]
-            )
+        processed_images = await request_style_transfer(
+            message.bot["http_session"],
+            message.bot["api_urls"]["transfer"],
+            style,
+            style_image,
+            content_images,
+            message.bot["config"]["model_app"]["username"],
+            message.bot["config"]["model_app"]["password"]
+        )
 
         media = types.MediaGroup()
         for image in processed_images:
             media.attach_photo(types.InputMediaPhoto(image))
 
-        curr_state = await Dispatcher.get_current().current_state().get_state()
+        curr_state = await state.get_state()
         if curr_state == StartStyleTransferForm.await_model_response.state:
             await message.answer("Here you are!")
             await message.answer_media_group(media)
@@ -173,33 +194,11 @@ async def other_message_handler(message: types.Message, state: FSMContext):
     curr_state = await state.get_state()
     if not curr_state:
         await message.reply("Sorry, I only understand commands. Feel free to use \"/help\".")
+        return None
 
-    elif curr_state == StartStyleTransferForm.choose_style.state:
-        await message.reply(
-            "Just a little reminder.\n"
-            "For now I expect you to choose a style from the list.\n"
-            "If you want to cancel the current operation, just send \"/cancel\" to the chat."
-        )
-
-    elif curr_state == StartStyleTransferForm.send_style_image.state:
-        await message.reply(
-            "Just a little reminder.\n"
-            "For now I expect you to send me a single style-image.\n"
-            "If you want to cancel the current operation, just send \"/cancel\" to the chat."
-        )
-
-    elif curr_state == StartStyleTransferForm.send_content_images.state:
-        await message.reply(
-            "Just a little reminder.\n"
-            f"For now I expect you to send me up to {StartStyleTransferForm.max_images} images to be transformed.\n"
-            "If you want to cancel the current operation, just send \"/cancel\" to the chat"
-        )
-
-    elif curr_state == StartStyleTransferForm.await_model_response.state:
-        await message.reply(
-            "I'm working on your request. Please wait a moment.\n"
-            "If you want to cancel the current operation, just send \"/cancel\" to the chat"
-        )
+    reminder = _REMINDERS.get(curr_state)
+    if reminder:
+        await message.reply(reminder)
 
 
 async def cancel_cmd_handler(message: types.Message, state: FSMContext):
@@ -219,16 +218,19 @@ async def examples_cmd_handler(message: types.Message):
     Set "/examples" command behavior.
     """
     await message.answer("Here are examples of style transfer:")
-    examples = await request_examples(
-        get_api_url(message.bot["config"]["model_app"]["model_url"], "examples"),
-        message.bot["config"]["model_app"]["username"],
-        message.bot["config"]["model_app"]["password"],
-        message.bot["config"]["bot_app"]["verify_ssl"]
-    )
+    examples = message.bot.get("examples_file_ids")
+    if not examples:
+        examples = await request_examples(
+            message.bot["http_session"],
+            message.bot["api_urls"]["examples"],
+            message.bot["config"]["model_app"]["username"],
+            message.bot["config"]["model_app"]["password"]
+        )
     media = types.MediaGroup()
     for example in examples:
         media.attach_photo(types.InputMediaPhoto(example))
-    await message.answer_media_group(media)
+    sent_messages = await message.answer_media_group(media)
+    message.bot["examples_file_ids"] = [msg.photo[-1].file_id for msg in sent_messages]
 
 
 def register_message_handlers(dp: Dispatcher) -> None:
@@ -1,14 +1,18 @@
 """Module provides middlewares to add extra logic to message processing layers."""
 
 import asyncio
-from typing import Union
+import logging
+from typing import Callable, Dict, Optional, Tuple, Union
 
 from aiogram import Dispatcher
 from aiogram import types as types
 from aiogram.dispatcher import DEFAULT_RATE_LIMIT
 from aiogram.dispatcher.handler import CancelHandler, current_handler
 from aiogram.dispatcher.middlewares import BaseMiddleware
-from aiogram.utils.exceptions import Throttled
+from aiogram.utils.exceptions import TelegramAPIError, Throttled
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
 
 
 class ThrottlingMiddleware(BaseMiddleware):
@@ -23,8 +27,28 @@ class ThrottlingMiddleware(BaseMiddleware):
         """
         self.rate_limit = limit
         self.prefix = key_prefix
+        self._handler_params: Dict[Callable, Tuple[float, str]] = {}
         super(ThrottlingMiddleware, self).__init__()
 
+    def _get_throttling_params(self, handler: Optional[Callable]) -> Tuple[float, str]:
+        """
+        Get a rate limit and a throttling key of a handler.
+        The parameters are static for each handler so they are computed once and cached.
+        :param handler: called handler.
+        :return: rate limit and throttling key.
+        """
+        if not handler:
+            return self.rate_limit, f"{self.prefix}_message"
+
+        params = self._handler_params.get(handler)
+        if params is None:
+            params = (
+                getattr(handler, "throttling_rate_limit", self.rate_limit),
+                getattr(handler, "throttling_key", f"{self.prefix}_{handler.__name__}")
+            )
+            self._handler_params[handler] = params
+        return params
+
     async def on_process_message(self, message: types.Message, data: dict):
         """
         Add extra logic to the "process_message" layer in order to prevent users
@@ -35,21 +59,22 @@ class ThrottlingMiddleware(BaseMiddleware):
         if message.media_group_id:
             return None
 
-        curr_handler = current_handler.get()
-        dispatcher = Dispatcher.get_current()
-
-        if curr_handler:
-            limit = getattr(curr_handler, "throttling_rate_limit", self.rate_limit)
-            key = getattr(curr_handler, "throttling_key", f"{self.prefix}_{curr_handler.__name__}")
-        else:
-            limit = self.rate_limit
-            key = f"{self.prefix}_message"
+        limit, key = self._get_throttling_params(current_handler.get())
 
         try:
-            await dispatcher.throttle(key, rate=limit)
+            await self.manager.dispatcher.throttle(key, rate=limit)
         except Throttled as throttled:
-            await message.delete()
-            await self.message_throttled(message, throttled)
+            results = await asyncio.gather(
+                message.delete(),
+                self.message_throttled(message, throttled),
+                return_exceptions=True
+            )
+            # a failed API call must not prevent the other one, but other errors are passed to the error handlers
+            for result in results:
+                if isinstance(result, TelegramAPIError):
+                    logger.warning("Failed to handle a throttled message: %r", result)
+                elif isinstance(result, BaseException):
+                    raise result
             raise CancelHandler()
 
     async def message_throttled(self, message: types.Message, throttled: Throttled):
@@ -60,13 +85,7 @@ class ThrottlingMiddleware(BaseMiddleware):
         :param message: message to be processed.
         :param throttled: throttling handler.
         """
-        handler = current_handler.get()
-        dispatcher = Dispatcher.get_current()
-
-        if handler:
-            key = getattr(handler, "throttling_key", f"{self.prefix}_{handler.__name__}")
-        else:
-            key = f"{self.prefix}_message"
+        _, key = self._get_throttling_params(current_handler.get())
 
         delta = throttled.rate - throttled.delta
 
@@ -77,7 +96,7 @@ class ThrottlingMiddleware(BaseMiddleware):
 
         await asyncio.sleep(delta)
 
-        thr = await dispatcher.check_key(key)
+        thr = await self.manager.dispatcher.check_key(key)
 
         if thr.exceeded_count == throttled.exceeded_count:
             await message.answer("You've been unbanned.")
@@ -87,14 +106,15 @@ class GatherMediaGroupMiddleware(BaseMiddleware):
     """
     This middleware gathers all messages belonging to the same media group as one message.
     """
-    media_group_data: dict = {}
-
-    def __init__(self, latency: Union[int, float] = 0.01):
+    def __init__(self, latency: Union[int, float] = 0.01, maxsize: int = 1024, ttl: Union[int, float] = 30):
         """
         Initialize an instance.
-        :param latency: maximum time to wait for the last message of media group.
+        :param latency: maximum time to wait for the next message of media group.
+        :param maxsize: maximum number of media groups to buffer at the same time.
+        :param ttl: time (in seconds) after which a buffered media group is dropped.
         """
         self.latency = latency
+        self.media_group_data = TTLCache(maxsize=maxsize, ttl=ttl)
         super(GatherMediaGroupMiddleware, self).__init__()
 
     async def on_process_message(self, message: types.Message, data: dict) -> None:
@@ -108,13 +128,22 @@ class GatherMediaGroupMiddleware(BaseMiddleware):
             return None
 
         elif message.media_group_id not in self.media_group_data:
-            self.media_group_data[message.media_group_id] = [message]
-            await asyncio.sleep(self.latency)
+            messages, new_message = [message], asyncio.Event()
+            self.media_group_data[message.media_group_id] = (messages, new_message)
+            # keep gathering until no other message of the media group arrives within the latency
+            while True:
+                new_message.clear()
+                try:
+                    await asyncio.wait_for(new_message.wait(), self.latency)
+                except asyncio.TimeoutError:
+                    break
             message.conf["is_last"] = True
-            data["media_group"] = self.media_group_data[message.media_group_id]
+            data["media_group"] = messages
 
         else:
-            self.media_group_data[message.media_group_id].append(message)
+            messages, new_message = self.media_group_data[message.media_group_id]
+            messages.append(message)
+            new_message.set()
             raise CancelHandler()
 
     async def on_post_process_message(self, message: types.Message, result: dict, data: dict) -> None:
@@ -126,7 +155,7 @@ class GatherMediaGroupMiddleware(BaseMiddleware):
         :param data: message data.
         """
         if message.media_group_id and message.conf.get("is_last"):
-            del self.media_group_data[message.media_group_id]
+            self.media_group_data.pop(message.media_group_id, None)
 
 
 def register_middlewares(dp: Dispatcher) -> None:
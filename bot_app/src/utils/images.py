@@ -1,24 +1,20 @@
 """Module provides useful functions to process images."""
 
-
-import base64
 from io import BytesIO
+from typing import Optional
 
-
-def image_to_base64(image: BytesIO) -> str:
-    """
-    Encode an image with base64 algorithm and convert it to a string.
-    :param image: image to be converted.
-    :return: string representation of encoded image.
-    """
-    image.seek(0)
-    return base64.encodebytes(image.read()).decode()
+from aiogram import Bot
 
 
-def base64_to_image(image: str) -> BytesIO:
+async def download_image(bot: Bot, file_id: Optional[str]) -> Optional[BytesIO]:
     """
-    Convert a string representation of image to bytes and decode them with base64 algorithm.
-    :param image: string representation of encoded image.
-    :return: decoded image.
+    Download an image by its telegram file id.
+    :param bot: bot instance to download the image with.
+    :param file_id: telegram file id of the image.
+    :return: downloaded image or None if the file id isn't given.
     """
-    return BytesIO(base64.decodebytes(image.encode()))
+    if not file_id:
+        return None
+    image = BytesIO()
+    await bot.download_file_by_id(file_id, destination=image)
+    return image
@@ -2,6 +2,11 @@
 
 import yaml
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML is built without LibYAML
+    from yaml import SafeLoader
+
 
 def load_config(path: str) -> dict:
     """
@@ -10,5 +15,5 @@ def load_config(path: str) -> dict:
     :return: loaded config.
     """
     with open(path) as f:
-        config = yaml.safe_load(f)
+        config = yaml.load(f, Loader=SafeLoader)
     return config
@@ -5,16 +5,30 @@ import torch.nn as nn
 import torch.nn.functional as F
 
 
+def _to_gram_matrix(x: torch.Tensor) -> torch.Tensor:
+    """
+    Compute the gram matrix for each sample of a given batch.
+    :param x: batch to compute the gram matrices for.
+    :return: gram matrices.
+    """
+    n, c, h, w = x.shape
+    x = x.view(n, c, h * w)
+    # the input of baddbmm is ignored when beta is 0, so the scaling is fused into the matrix product
+    return torch.baddbmm(x.new_empty((1, 1, 1)).expand(n, c, c), x, x.transpose(1, 2), beta=0, alpha=1 / (c * h * w))
+
+
 class ContentLoss(nn.Module):
     """Loss function that measures how different the content is between two images"""
+    loss: torch.Tensor
+
     def __init__(self, target: torch.Tensor):
         """
         Initialize an instance.
         :param target: reference image to measure content difference with.
         """
         super(ContentLoss, self).__init__()
-        self.target = nn.Parameter(target.detach())
-        self.loss = None
+        self.register_buffer("target", target.detach())
+        self.loss = torch.zeros(())
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         """
@@ -22,20 +36,24 @@ class ContentLoss(nn.Module):
         :param x: input tensor.
         :return: output tensor.
         """
-        self.loss = F.mse_loss(x, self.target)
+        # per-sample losses are summed so a one-image batch gives the same loss as before
+        self.loss = F.mse_loss(x, self.target) * x.shape[0]
         return x
 
 
 class StyleLoss(nn.Module):
     """Loss function that measures how different the style is between two images"""
+    loss: torch.Tensor
+
     def __init__(self, target: torch.Tensor):
         """
         Initialize an instance.
         :param target: reference image to measure style difference with.
         """
         super(StyleLoss, self).__init__()
-        self.target = nn.Parameter(self._to_gram_matrix(target.detach()))
-        self.loss = None
+        # the gram matrix of the target is constant so it's computed once and kept as a buffer
+        self.register_buffer("target", _to_gram_matrix(target.detach()))
+        self.loss = torch.zeros(())
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         """
@@ -43,16 +61,7 @@ class StyleLoss(nn.Module):
         :param x: input tensor.
         :return: output tensor.
         """
-        self.loss = F.mse_loss(self._to_gram_matrix(x), self.target)
+        gram_matrix = _to_gram_matrix(x)
+        # the style target is shared by all the samples, whose losses are summed
+        self.loss = F.mse_loss(gram_matrix, self.target.expand_as(gram_matrix)) * x.shape[0]
         return x
-
-    @staticmethod
-    def _to_gram_matrix(x: torch.Tensor) -> torch.Tensor:
-        """
-        Compute the gram matrix for a given tensor.
-        :param x: tensor to compute the gram matrix for.
-        :return: gram matrix.
-        """
-        d1, d2, d3, d4 = x.shape
-        x = x.view(d1 * d2, d3 * d4)
-        return x.mm(x.T) / x.numel()
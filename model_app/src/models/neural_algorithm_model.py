@@ -1,6 +1,5 @@
 """Module provides custom models that are used to transfer a style from one image to another."""
 
-from copy import deepcopy
 from typing import Iterable, Tuple, Union
 
 import torch
@@ -21,18 +20,20 @@ class NeuralAlgorithmModel(nn.Module):
         style_ids: Iterable,
         mean: Union[list, tuple] = (0.485, 0.456, 0.406),
         std: Union[list, tuple] = (0.229, 0.224, 0.225),
-        device: str = ("cpu" if not torch.cuda.is_available() else "cuda")
+        device: str = ("cpu" if not torch.cuda.is_available() else "cuda"),
+        script: bool = False
     ):
         """
         Initialize an instance.
         :param backbone: pretrained model to use its layers as a base.
-        :param content_img: target image for the content.
+        :param content_img: target images for the content as a batch, one for each image to be fitted.
         :param style_img: target image for the style.
         :param content_ids: indices of backbone model convolution layers to put a content loss instance after.
         :param style_ids: indices of backbone model convolution layers to put a style loss instance after.
         :param mean: means for each channel to normalize input image.
         :param std: standard deviations for each channel to normalize input image.
         :param device: device to use (e.g. "cpu", "cuda").
+        :param script: whether to compile the model with TorchScript to reduce per-layer python overhead.
         """
         super(NeuralAlgorithmModel, self).__init__()
 
@@ -41,6 +42,8 @@ class NeuralAlgorithmModel(nn.Module):
         self.content_ids = content_ids
         self.style_ids = style_ids
         self.device = device
+        # cuDNN convolutions are faster with the channels last memory format
+        self.memory_format = torch.channels_last if device.startswith("cuda") else torch.contiguous_format
 
         self.model, self.content_losses, self.style_losses = self._get_model(
             backbone,
@@ -48,6 +51,11 @@ class NeuralAlgorithmModel(nn.Module):
             content_ids, style_ids,
             mean, std
         )
+        self.model = self.model.to(memory_format=self.memory_format)
+        if script:
+            self.model, self.content_losses, self.style_losses = self._script_model(
+                self.model, self.content_losses, self.style_losses
+            )
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         """
@@ -55,7 +63,7 @@ class NeuralAlgorithmModel(nn.Module):
         :param x: input tensor.
         :return: output tensor.
         """
-        return self.model(x)
+        return self.model(x.to(memory_format=self.memory_format))
 
     def _get_model(
         self,
@@ -70,7 +78,7 @@ class NeuralAlgorithmModel(nn.Module):
         """
         Construct a style transfer model instance using backbone model layers.
         :param backbone: pretrained model to use its layers as a base.
-        :param content_img: target image for content.
+        :param content_img: target images for content as a batch.
         :param style_img: target image for style.
         :param content_ids: indices of backbone model convolution layers to put a content loss instance after.
         :param style_ids: indices of backbone model convolution layers to put a style loss instance after.
@@ -84,23 +92,58 @@ class NeuralAlgorithmModel(nn.Module):
 
         content_losses, style_losses = [], []
         conv_cnt = 0
+        # layers after the deepest loss don't affect the losses so they are not added to the model
+        last_conv_id = max(max(content_ids), max(style_ids))
+
+        # target features are computed layer by layer instead of running the whole model for each loss
+        with torch.inference_mode():
+            content_features = model(content_img.to(self.device))
+            style_features = model(style_img.to(self.device))
 
         for layer in backbone.to(self.device).children():
-            model.append(deepcopy(layer) if not isinstance(layer, nn.ReLU) else nn.ReLU(False))
+            # the backbone layers are shared, not copied, as they are frozen and never changed
+            # the only exception is inplace relu layers
+            if isinstance(layer, nn.ReLU):
+                layer = nn.ReLU(False)
+            layer.requires_grad_(False)
+            model.append(layer.eval())
+
+            with torch.inference_mode():
+                content_features = layer(content_features)
+                style_features = layer(style_features)
 
             if isinstance(layer, nn.Conv2d):
                 conv_cnt += 1
+                # inference tensors can't be used by autograd later, so the targets are cloned outside of the context
                 if conv_cnt in content_ids:
-                    content_loss = ContentLoss(model(content_img.to(self.device)))
+                    content_loss = ContentLoss(content_features.clone())
                     model.append(content_loss)
                     content_losses.append(content_loss)
 
                 if conv_cnt in style_ids:
-                    style_loss = StyleLoss(model(style_img.to(self.device)))
+                    style_loss = StyleLoss(style_features.clone())
                     model.append(style_loss)
                     style_losses.append(style_loss)
 
-            if conv_cnt == max(max(content_ids), max(style_ids)):
+            if conv_cnt == last_conv_id:
                 break
 
         return model, content_losses, style_losses
+
+    @staticmethod
+    def _script_model(model: nn.Sequential, content_losses: list, style_losses: list) -> Tuple[nn.Module, list, list]:
+        """
+        Compile a style transfer model with TorchScript.
+        The loss layers of the compiled model are different objects, so the loss lists are rebuilt to point at them.
+        The model isn't frozen because the loss layers store their losses as attributes during the forward pass.
+        :param model: style transfer model.
+        :param content_losses: content loss layers of the model.
+        :param style_losses: style loss layers of the model.
+        :return: compiled model and its content and style loss layers.
+        """
+        names = {id(layer): name for name, layer in model.named_children()}
+        scripted_model = torch.jit.script(model.eval())
+        scripted_layers = dict(scripted_model.named_children())
+        content_losses = [scripted_layers[names[id(layer)]] for layer in content_losses]
+        style_losses = [scripted_layers[names[id(layer)]] for layer in style_losses]
+        return scripted_model, content_losses, style_losses
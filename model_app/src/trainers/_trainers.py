@@ -3,32 +3,78 @@ Module provides custom trainers that are used to fit
 an input image to desired style via a style transfer model.
 """
 
+import threading
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-from typing import Callable
+from typing import Callable, ContextManager, Iterator, Optional
 
 import torch
 import torch.nn as nn
 import torch.optim as optim
 
+from src.utils.locks import SharedExclusiveLock
+
+_cudnn_benchmark_lock = threading.Lock()
+_cudnn_benchmark_fits = 0
+_cudnn_benchmark_default = None
+
+
+@contextmanager
+def _cudnn_benchmark() -> Iterator[None]:
+    """
+    Enable cuDNN autotuning while at least one image is fitted.
+    Input shape is the same on every iteration of a fit, so the fastest convolution algorithms are picked once,
+    but autotuning is not left on for other models that get inputs of arbitrary size.
+    The flag is global, so its previous value is restored only when the last concurrent fit is done.
+    """
+    global _cudnn_benchmark_fits, _cudnn_benchmark_default
+
+    with _cudnn_benchmark_lock:
+        if not _cudnn_benchmark_fits:
+            _cudnn_benchmark_default = torch.backends.cudnn.benchmark
+            torch.backends.cudnn.benchmark = True
+        _cudnn_benchmark_fits += 1
+    try:
+        yield
+    finally:
+        with _cudnn_benchmark_lock:
+            _cudnn_benchmark_fits -= 1
+            if not _cudnn_benchmark_fits:
+                torch.backends.cudnn.benchmark = _cudnn_benchmark_default
+
 
 class Trainer:
     """Trainer that uses a style transfer model to fit an input image to desired style."""
     def __init__(
         self,
         model: nn.Module,
-        device: str = ("cpu" if not torch.cuda.is_available() else "cuda")
+        device: str = ("cpu" if not torch.cuda.is_available() else "cuda"),
+        cuda_graph: bool = False,
+        amp_dtype: Optional[torch.dtype] = None,
+        lock: Optional[SharedExclusiveLock] = None
     ):
         """
         Initialize an instance.
         :param model: style transfer model.
         :param device: device to use (e.g. "cpu", "cuda")
+        :param cuda_graph: whether to capture the closure function into a CUDA graph and replay it (CUDA only).
+        :param amp_dtype: lower precision data type (e.g. torch.bfloat16) to run the model in via autocast.
+            The input image is kept in full precision. Mixed precision is disabled if not given.
+        :param lock: lock shared by all threads that use the device.
+            The CUDA graph is captured in exclusive mode and the rest of the GPU work is done in shared mode.
         """
         self.model = model.eval().to(device).requires_grad_(False)
         self.device = device
+        self.cuda_graph = cuda_graph and device.startswith("cuda")
+        self.amp_dtype = amp_dtype
+        self.lock = lock
+        self._content_losses = tuple(self.model.content_losses)
+        self._style_losses = tuple(self.model.style_losses)
         self._counter = None
         self._content_loss = None
         self._style_loss = None
 
+    @_cudnn_benchmark()
     def fit(
         self,
         input_img: torch.Tensor,
@@ -50,19 +96,28 @@ class Trainer:
         """
         self._init_params()
 
-        if not inplace:
-            input_img = input_img.clone()
-        input_img = input_img.to(self.device).requires_grad_(True)
+        with self._shared_lock():
+            if not inplace:
+                input_img = input_img.clone()
+            input_img = input_img.to(self.device).requires_grad_(True)
+            # the gradient is allocated once and zeroed in place on each closure evaluation
+            input_img.grad = torch.zeros_like(input_img)
+
+            optimizer = self._get_optimizer(input_img)
 
-        optimizer = self._get_optimizer(input_img)
-        closure_fn = self._get_closure_fn(input_img, optimizer, content_weight, style_weight, verbose)
+        if self.cuda_graph:
+            closure_fn = self._get_graphed_closure_fn(input_img, content_weight, style_weight, verbose)
+        else:
+            closure_fn = self._get_closure_fn(input_img, optimizer, content_weight, style_weight, verbose)
 
         while self._counter < max_iter:
-            optimizer.step(closure_fn)
+            # the lock is taken per step, so a graph capture of another thread waits for a single step only
+            with self._shared_lock():
+                optimizer.step(closure_fn)
         if verbose:
             self._print_metrics()
 
-        with torch.no_grad():
+        with self._shared_lock(), torch.no_grad():
             input_img.clamp_(0, 1)
 
         return input_img
@@ -103,14 +158,12 @@ class Trainer:
         :return: closure function.
         """
         def closure_fn() -> torch.Tensor:
-            with torch.no_grad():
-                input_img.clamp_(0, 1)
+            optimizer.zero_grad(set_to_none=False)
+            with self._autocast():
+                self.model(input_img)
 
-            optimizer.zero_grad()
-            self.model(input_img)
-
-            self._content_loss = content_weight * sum(map(lambda x: x.loss, self.model.content_losses))
-            self._style_loss = style_weight * sum(map(lambda x: x.loss, self.model.style_losses))
+            self._content_loss = content_weight * torch.stack([x.loss for x in self._content_losses]).sum()
+            self._style_loss = style_weight * torch.stack([x.loss for x in self._style_losses]).sum()
 
             loss = self._content_loss + self._style_loss
             loss.backward()
@@ -123,6 +176,94 @@ class Trainer:
 
         return closure_fn
 
+    def _get_graphed_closure_fn(
+        self,
+        input_img: torch.Tensor,
+        content_weight: float,
+        style_weight: float,
+        verbose: int = None
+    ) -> Callable:
+        """
+        Create a closure function that is needed by the optimizer.
+        One evaluation of the closure is captured into a CUDA graph, so each call replays
+        all the kernels of the forward and backward passes at once.
+        The optimizer updates the input image in place, so the graph always reads its current values.
+        :param input_img: image to be fitted.
+        :param content_weight: content loss weight.
+        :param style_weight: style loss weight.
+        :param verbose: frequency (in iterations) to display performance metrics.
+        :return: closure function.
+        """
+        # the gradient is preallocated by the fit method, so the graph accumulates into the same memory
+        def step_fn() -> tuple:
+            input_img.grad.zero_()
+            with self._autocast():
+                self.model(input_img)
+
+            content_loss = content_weight * torch.stack([x.loss for x in self._content_losses]).sum()
+            style_loss = style_weight * torch.stack([x.loss for x in self._style_losses]).sum()
+
+            loss = content_loss + style_loss
+            loss.backward()
+
+            return content_loss, style_loss, loss
+
+        # a capture fails if another thread touches the device meanwhile, so no other GPU work is run
+        with self._exclusive_lock():
+            # warm up on a side stream before capturing as required by CUDA graphs
+            stream = torch.cuda.Stream()
+            stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(stream):
+                for _ in range(3):
+                    step_fn()
+            torch.cuda.current_stream().wait_stream(stream)
+
+            graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(graph):
+                content_loss, style_loss, loss = step_fn()
+
+        def closure_fn() -> torch.Tensor:
+            graph.replay()
+
+            self._content_loss = content_loss
+            self._style_loss = style_loss
+
+            if verbose and self._counter % verbose == 0:
+                self._print_metrics()
+            self._counter += 1
+
+            # the graph output is overwritten on every replay
+            return loss.detach().clone()
+
+        return closure_fn
+
+    def _shared_lock(self) -> ContextManager:
+        """
+        Create a context to do GPU work along with other threads.
+        :return: lock context.
+        """
+        return self.lock.shared() if self.lock else nullcontext()
+
+    def _exclusive_lock(self) -> ContextManager:
+        """
+        Create a context to do GPU work while other threads wait.
+        :return: lock context.
+        """
+        return self.lock.exclusive() if self.lock else nullcontext()
+
+    def _autocast(self) -> torch.autocast:
+        """
+        Create a context to run the model in mixed precision.
+        The autocast cache is disabled so that the casts are also captured by CUDA graphs.
+        :return: autocast context.
+        """
+        return torch.autocast(
+            device_type=self.device.split(":")[0],
+            dtype=self.amp_dtype,
+            enabled=self.amp_dtype is not None,
+            cache_enabled=False
+        )
+
     def _print_metrics(self) -> None:
         """
         Show current performance metrics.
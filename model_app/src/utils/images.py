@@ -1,16 +1,13 @@
 """Module provides useful functions to process images."""
 
-import base64
-import random
-from io import BytesIO
+import functools
 from os.path import dirname, join
-from typing import Union, List
+from typing import BinaryIO, Union, List
 
 import matplotlib.pyplot as plt
 import torch
-from PIL import Image
-from torchvision.io import read_image
-from torchvision.transforms.functional import convert_image_dtype, resize, to_tensor
+from torchvision.io import ImageReadMode, decode_image, read_image
+from torchvision.transforms.functional import convert_image_dtype, resize
 
 
 def load_image_from_file(path: str, size: Union[int, List[int]] = None) -> torch.Tensor:
@@ -27,16 +24,26 @@ def load_image_from_file(path: str, size: Union[int, List[int]] = None) -> torch
     return image[None]
 
 
-def load_image_from_buffer(buffer: BytesIO, size: Union[int, List[int]] = None) -> torch.Tensor:
+def load_image_from_buffer(
+    buffer: BinaryIO,
+    size: Union[int, List[int]] = None,
+    device: str = ("cpu" if not torch.cuda.is_available() else "cuda")
+) -> torch.Tensor:
     """
     Load and process an image from a byte buffer.
     :param buffer: byte buffer.
     :param size: desired output size.
+    :param device: device to put the image on before the conversion and resizing (e.g. "cpu", "cuda").
     :return: processed image.
     """
     buffer.seek(0)
-    image = Image.open(buffer)
-    image = to_tensor(image)
+    # the image is decoded straight into a tensor, a writable buffer is needed to avoid a warning
+    data = torch.frombuffer(bytearray(buffer.read()), dtype=torch.uint8)
+    image = decode_image(data, mode=ImageReadMode.RGB)
+    # the image is copied as uint8 which is 4 times smaller than float, the rest is done on the device
+    if device != "cpu":
+        image = image.pin_memory().to(device, non_blocking=True)
+    image = convert_image_dtype(image)
     if size:
         image = resize(image, size, antialias=True)
     return image[None]
@@ -61,25 +68,6 @@ def plot_examples(images: List[torch.Tensor], titles: list = None, size: int = 5
     return fig, axes
 
 
-def image_to_base64(image: BytesIO) -> str:
-    """
-    Encode an image with base64 algorithm and convert it to a string.
-    :param image: image to be converted.
-    :return: string representation of encoded image.
-    """
-    image.seek(0)
-    return base64.encodebytes(image.read()).decode()
-
-
-def base64_to_image(image: str) -> BytesIO:
-    """
-    Convert a string representation of image to bytes and decode them with base64 algorithm.
-    :param image: string representation of encoded image.
-    :return: decoded image.
-    """
-    return BytesIO(base64.decodebytes(image.encode()))
-
-
 class ImagePool:
     """This class implements an image buffer that stores previously generated images.
 
@@ -96,7 +84,7 @@ class ImagePool:
         self.pool_size = pool_size
         if self.pool_size > 0:  # create an empty pool
             self.num_imgs = 0
-            self.images = []
+            self.images = None  # allocated on the first query, once the image shape is known
 
     def query(self, images):
         """Return an image from the pool.
@@ -112,39 +100,41 @@ class ImagePool:
         """
         if self.pool_size == 0:  # if the buffer size is 0, do nothing
             return images
-        return_images = []
-        for image in images:
-            image = torch.unsqueeze(image.data, 0)
-            if self.num_imgs < self.pool_size:   # if the buffer is not full; keep inserting current images to the buffer
-                self.num_imgs = self.num_imgs + 1
-                self.images.append(image)
-                return_images.append(image)
-            else:
-                p = random.uniform(0, 1)
-                if p > 0.5:  # by 50% chance, the buffer will return a previously stored image, and insert the current image into the buffer
-                    random_id = random.randint(0, self.pool_size - 1)  # randint is inclusive
-                    tmp = self.images[random_id].clone()
-                    self.images[random_id] = image
-                    return_images.append(tmp)
-                else:       # by another 50% chance, the buffer will return the current image
-                    return_images.append(image)
-        return_images = torch.cat(return_images, 0)   # collect all the images and return
+        images = images.detach()
+        if self.images is None:
+            self.images = images.new_empty((self.pool_size, *images.shape[1:]))
+
+        # if the buffer is not full; keep inserting current images to the buffer
+        num_fill = min(self.pool_size - self.num_imgs, images.shape[0])
+        self.images[self.num_imgs:self.num_imgs + num_fill] = images[:num_fill]
+        self.num_imgs = self.num_imgs + num_fill
+
+        # by 50% chance, the buffer will return a previously stored image, and insert the current image into the buffer
+        # by another 50% chance, the buffer will return the current image
+        rest_images = images[num_fill:]
+        swap_mask = torch.rand(rest_images.shape[0], device=images.device) > 0.5
+        random_ids = torch.randint(0, self.pool_size, (rest_images.shape[0],), device=images.device)
+        stored_images = self.images[random_ids]  # indexing makes a copy, so it isn't affected by the insertion below
+        self.images[random_ids[swap_mask]] = rest_images[swap_mask]
+        rest_images = torch.where(swap_mask[:, None, None, None], stored_images, rest_images)
+
+        return_images = torch.cat([images[:num_fill], rest_images], 0)   # collect all the images and return
         return return_images
 
 
-def get_examples() -> dict:
+@functools.lru_cache(maxsize=1)
+def get_examples() -> List[bytes]:
     """
     Prepare examples of style transfer.
-    :return: examples of style transfer.
+    The examples are already stored as PNG, so the files are read once and sent as is.
+    :return: PNG encoded examples of style transfer.
     """
-    examples = {"example_images": []}
+    examples = []
     styles = ["style_monet", "style_vangogh", "style_cezanne", "style_ukiyoe", "style_custom"]
 
     root = join(dirname(dirname(dirname(__file__))), "examples")
     for style in styles:
-        buffer = BytesIO()
-        image = Image.open(join(root, style, "transformed.png"))
-        image.save(buffer, format="PNG")
-        examples["example_images"].append(image_to_base64(buffer))
+        with open(join(root, style, "transformed.png"), "rb") as f:
+            examples.append(f.read())
 
     return examples
@@ -0,0 +1,66 @@
+"""Module provides locks to synchronize threads."""
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class SharedExclusiveLock:
+    """
+    Lock that is held either by any number of threads in shared mode or by a single thread in exclusive mode.
+    Waiting exclusive owners are preferred, so they are not starved by a stream of shared owners.
+    The lock is not reentrant.
+    """
+    def __init__(self, enabled: bool = True):
+        """
+        Initialize an instance.
+        :param enabled: whether to synchronize threads. A disabled lock is always acquired at once.
+        """
+        self.enabled = enabled
+        self._condition = threading.Condition()
+        self._shared_owners = 0
+        self._exclusive_owner = False
+        self._exclusive_waiters = 0
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        """
+        Hold the lock in shared mode.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        with self._condition:
+            self._condition.wait_for(lambda: not self._exclusive_owner and not self._exclusive_waiters)
+            self._shared_owners += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._shared_owners -= 1
+                if not self._shared_owners:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """
+        Hold the lock in exclusive mode.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        with self._condition:
+            self._exclusive_waiters += 1
+            try:
+                self._condition.wait_for(lambda: not self._exclusive_owner and not self._shared_owners)
+            finally:
+                self._exclusive_waiters -= 1
+            self._exclusive_owner = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive_owner = False
+                self._condition.notify_all()
@@ -1,53 +1,92 @@
 """Module provides useful functions to make requests."""
 
 import functools
-from io import BytesIO
-from typing import Tuple, List, Callable, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, List, Callable, Any, Iterator
+from uuid import uuid4
 
 import torch
-from flask import request
-from torchvision.transforms.functional import to_pil_image
+from flask import request, Response
+from torchvision.io import encode_png
+from torchvision.transforms.functional import convert_image_dtype
+from werkzeug.datastructures import MultiDict
 from werkzeug.security import check_password_hash
 from yaml import safe_load
 
-from src.utils.images import load_image_from_buffer, base64_to_image, image_to_base64
+from src.utils.images import load_image_from_buffer
 
+# decoding, resizing and encoding run in native code without holding the GIL, so images are processed in parallel
+_image_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="images")
 
-def extract_original_images(json: dict, with_style: bool = True) -> Tuple[torch.Tensor, List[torch.Tensor]]:
+
+def extract_original_images(files: MultiDict, with_style: bool = True) -> Tuple[torch.Tensor, List[torch.Tensor]]:
     """
-    Parse a received request in order to extract style and content images
+    Parse files of a received multipart request in order to extract style and content images
     and convert them to torch tensors.
-    :param json: request as a python dict.
+    :param files: uploaded files of the request.
     :param with_style: whether to extract the style image.
     :return: style and content images as torch tensors.
     """
     if with_style:
         size = [512, 512] if torch.cuda.is_available() else [256, 256]
-        style_image = load_image_from_buffer(base64_to_image(json["style_image"]), size)
+        style_image = _image_executor.submit(load_image_from_buffer, files["style_image"].stream, size)
     else:
         size = None
         style_image = None
 
     content_images = [
-        load_image_from_buffer(base64_to_image(image), size)
-        for image in json["content_images"]
+        _image_executor.submit(load_image_from_buffer, image.stream, size)
+        for image in files.getlist("content_images")
     ]
 
+    style_image = style_image.result() if style_image else None
+    content_images = [content_image.result() for content_image in content_images]
+
     return style_image, content_images
 
 
-def pack_processed_images(fitted_images: List[torch.Tensor]) -> dict:
+def pack_processed_images(fitted_images: List[torch.Tensor]) -> Response:
     """
-    Convert each fitted image to a string encoded with base64 algorithm.
+    Encode each fitted image as PNG and pack them into a multipart response.
     :param fitted_images: fitted images.
-    :return: encoded images.
+    :return: multipart response.
+    """
+    images = list(_image_executor.map(_encode_png, fitted_images))
+    return to_multipart_response(images)
+
+
+def _encode_png(image: torch.Tensor) -> bytes:
+    """
+    Encode an image as PNG.
+    :param image: image with values in range [0, 1].
+    :return: PNG encoded image.
     """
-    response = {"fitted_images": []}
-    for image in fitted_images:
-        buffer = BytesIO()
-        to_pil_image(image, mode="RGB").save(buffer, format="PNG")
-        response["fitted_images"].append(image_to_base64(buffer))
-    return response
+    image = convert_image_dtype(image.detach().cpu().clamp(0, 1), torch.uint8)
+    # a lower compression level makes the encoding several times faster for a slightly bigger payload
+    return encode_png(image, compression_level=3).numpy().tobytes()
+
+
+def to_multipart_response(images: List[bytes], content_type: str = "image/png") -> Response:
+    """
+    Stream encoded images as parts of a "multipart/mixed" response.
+    :param images: encoded images.
+    :param content_type: content type of each image.
+    :return: multipart response.
+    """
+    boundary = uuid4().hex
+
+    def generate() -> Iterator[bytes]:
+        for image in images:
+            yield (
+                f"--{boundary}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(image)}\r\n\r\n"
+            ).encode()
+            yield image
+            yield b"\r\n"
+        yield f"--{boundary}--\r\n".encode()
+
+    return Response(generate(), content_type=f"multipart/mixed; boundary={boundary}")
 
 
 def load_users(path: str) -> dict:
@@ -69,8 +108,9 @@ def login(users: dict) -> Callable:
     def outer_wrapper(func: Callable) -> Callable:
         @functools.wraps(func)
         def inner_wrapper(*args, **kwargs) -> Any:
-            user = request.json.get("username")
-            pwd = request.json.get("password")
+            credentials = request.form or request.get_json(silent=True) or {}
+            user = credentials.get("username")
+            pwd = credentials.get("password")
             if user and pwd:
                 if user in users and check_password_hash(users[user], pwd):
                     return func(*args, **kwargs)
@@ -1,60 +1,91 @@
 """Module provides useful functions to fit models."""
 
+import functools
 import sys
 from copy import deepcopy
 from typing import List
 
 import torch
+import torch.nn as nn
 from torchvision.models import vgg19
 
 from src.models import NeuralAlgorithmModel, create_model
 from src.models.test_model import TestModel
 from src.options.test_options import TestOptions
 from src.trainers import Trainer
+from src.utils.locks import SharedExclusiveLock
+
+# CUDA graphs are captured only on GPU, so threads of concurrent requests are synchronized only there
+gpu_lock = SharedExclusiveLock(enabled=torch.cuda.is_available())
+
+
+@functools.lru_cache(maxsize=1)
+def get_backbone(device: str = ("cpu" if not torch.cuda.is_available() else "cuda")) -> nn.Module:
+    """
+    Load the pretrained backbone model once and reuse it for all requests.
+    :param device: device to use (e.g. "cpu", "cuda").
+    :return: frozen backbone model.
+    """
+    return vgg19(pretrained=True).features.eval().requires_grad_(False).to(device)
 
 
 def init_trainer(style_img: torch.Tensor, content_img: torch.Tensor) -> Trainer:
     """
     Construct a model instance using backbone model layers and put it into a trainer.
     :param style_img: style-image.
-    :param content_img: content-image.
+    :param content_img: batch of content-images.
     :return: model trainer.
     """
-    backbone_model = vgg19(pretrained=True).features.eval()
-    model = NeuralAlgorithmModel(backbone_model, content_img, style_img, [4], [1, 2, 3, 4, 5])
-    trainer = Trainer(model)
+    cuda_graph = torch.cuda.is_available()
+    backbone_model = get_backbone()
+    # a replayed CUDA graph has no per-layer Python overhead, so scripting would only add compilation time
+    model = NeuralAlgorithmModel(
+        backbone_model, content_img, style_img, [4], [1, 2, 3, 4, 5], script=not cuda_graph
+    )
+    trainer = Trainer(
+        model,
+        cuda_graph=cuda_graph,
+        amp_dtype=torch.bfloat16 if torch.cuda.is_available() and torch.cuda.is_bf16_supported() else None,
+        lock=gpu_lock
+    )
     return trainer
 
 
-def fit_image(
+def fit_images(
     trainer: Trainer,
-    input_img: torch.Tensor,
+    input_imgs: torch.Tensor,
     max_iter: int = 300,
     verbose: int = None
-) -> torch.Tensor:
+) -> List[torch.Tensor]:
     """
-    Change an input image to resemble content of a content-image and artistic style of a style-image.
+    Change input images to resemble content of content-images and artistic style of a style-image.
     :param trainer: model trainer.
-    :param input_img: image to be fitted.
+    :param input_imgs: batch of images to be fitted.
     :param max_iter: maximum number of iterations of the optimization algorithm.
     :param verbose: frequency (in iterations) to display performance metrics.
-    :return: fitted image.
+    :return: fitted images.
     """
-    fitted_img = trainer.fit(input_img, max_iter=max_iter, verbose=verbose)
-    return fitted_img[0]
+    fitted_imgs = trainer.fit(input_imgs, max_iter=max_iter, verbose=verbose)
+    return list(fitted_imgs)
 
 
-def get_fitted_image(style_img: torch.Tensor, content_img: torch.Tensor) -> torch.Tensor:
+def get_fitted_images(style_img: torch.Tensor, content_imgs: List[torch.Tensor]) -> List[torch.Tensor]:
     """
-    Change a copy of content-image to resemble artistic style of a style-image
+    Change copies of content-images to resemble artistic style of a style-image
     via the neural transfer algorithm.
+    All the content-images are fitted at once as a single batch.
     :param style_img: style-image.
-    :param content_img: content-image.
-    :return: fitted image.
+    :param content_imgs: content-images of the same size.
+    :return: fitted images.
     """
-    trainer = init_trainer(style_img, content_img)
-    fitted_img = fit_image(trainer, content_img.clone())
-    return fitted_img.detach().cpu()
+    with gpu_lock.shared():
+        content_batch = torch.cat(content_imgs, dim=0)
+        trainer = init_trainer(style_img, content_batch)
+        input_imgs = content_batch.clone()
+    # the trainer takes the lock itself, so that the CUDA graph can be captured in exclusive mode
+    fitted_imgs = fit_images(trainer, input_imgs)
+    with gpu_lock.shared():
+        return [fitted_img.detach().cpu() for fitted_img in fitted_imgs]
 
 
 def get_pretrained_gan_model(